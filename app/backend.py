@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import shutil
 import sys
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, List
 
@@ -34,6 +35,9 @@ def normalize_execution_mode(execution_mode: str) -> str:
     return DEFAULT_EXECUTION_MODE
 
 
+# The label helpers below take one of a handful of backend/mode names and are called
+# several times per rerun, so their results are memoised.
+@lru_cache(maxsize=16)
 def get_execution_mode_label(execution_mode: str) -> str:
     mode = normalize_execution_mode(execution_mode)
     if mode == EXEC_MODE_CLI:
@@ -61,6 +65,7 @@ def get_cli_label(cli_backend: str) -> str:
     return cfg["label"]
 
 
+@lru_cache(maxsize=16)
 def safe_cli_label(cli_backend: str) -> str:
     if cli_backend in CLI_CONFIGS:
         return get_cli_label(cli_backend)
@@ -82,6 +87,7 @@ def get_available_cli_backends() -> List[str]:
 
 # --- Runtime backend helpers ---
 
+@lru_cache(maxsize=16)
 def safe_runtime_label(runtime_backend: str) -> str:
     try:
         return get_runtime_label(runtime_backend)
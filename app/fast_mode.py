@@ -2,24 +2,30 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
+import os
 import re
 import shlex
 import subprocess
+import tempfile
+import time
 import uuid
 import zipfile
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from app.config import (
     DATA_DIR,
     FAST_SECTION_TITLES,
     EXEC_MODE_CLI,
+    OUTPUT_DIR,
     ROOT_DIR,
 )
 from app.utils import normalize_newlines, to_display_path, xml_escape
-from app.session import append_log_event
+from app.session import append_log_bytes, format_log_event
 from app.backend import (
     get_cli_label,
     safe_runtime_label,
@@ -27,24 +33,31 @@ from app.backend import (
 from runtime_client import RuntimeClientError, generate_text
 
 
+_FAST_PROMPT_HEADER = (
+    "你是一名资深中国专利代理人。请把给定的发明构思扩写为可用于专利写作的技术交底草稿。\n\n"
+    "输出要求：\n"
+    "1. 仅输出中文 Markdown 正文，不要输出解释、前言或额外说明。\n"
+    "2. 必须包含以下章节，并保持该顺序：\n"
+    + "\n".join(f"- {title}" for title in FAST_SECTION_TITLES)
+    + "\n"
+    '3. 每个章节都要给出具体技术内容，避免空泛表述。参数不明确时可合理假设，并显式标注"假设：..."。\n'
+    "4. 适度补充实施细节（结构、流程、关键参数范围、可选方案），使内容可直接用于后续专利生成。\n"
+    "5. 输出必须严格包裹在以下标记之间：\n"
+    "<FAST_DISCLOSURE_START>\n"
+    "...这里是正文...\n"
+    "<FAST_DISCLOSURE_END>\n\n"
+    "发明构思如下：\n"
+)
+
+_FAST_BLOCK_RE = re.compile(r"<FAST_DISCLOSURE_START>(.*?)<FAST_DISCLOSURE_END>", re.DOTALL)
+_FENCE_RE = re.compile(r"```(?:markdown|md|text)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+
+
+# prepare_fast_mode_input builds the prompt for its cache key and the runtime path builds it
+# again for the request, so the second call is a hit.
+@lru_cache(maxsize=8)
 def build_fast_mode_prompt(invention_idea: str) -> str:
-    idea = normalize_newlines(invention_idea).strip()
-    required_sections = "\n".join(f"- {title}" for title in FAST_SECTION_TITLES)
-    return (
-        "你是一名资深中国专利代理人。请把给定的发明构思扩写为可用于专利写作的技术交底草稿。\n\n"
-        "输出要求：\n"
-        "1. 仅输出中文 Markdown 正文，不要输出解释、前言或额外说明。\n"
-        "2. 必须包含以下章节，并保持该顺序：\n"
-        f"{required_sections}\n"
-        '3. 每个章节都要给出具体技术内容，避免空泛表述。参数不明确时可合理假设，并显式标注"假设：..."。\n'
-        "4. 适度补充实施细节（结构、流程、关键参数范围、可选方案），使内容可直接用于后续专利生成。\n"
-        "5. 输出必须严格包裹在以下标记之间：\n"
-        "<FAST_DISCLOSURE_START>\n"
-        "...这里是正文...\n"
-        "<FAST_DISCLOSURE_END>\n\n"
-        "发明构思如下：\n"
-        f"{idea}\n"
-    )
+    return _FAST_PROMPT_HEADER + normalize_newlines(invention_idea).strip() + "\n"
 
 
 def extract_text_chunks_from_payload(payload: Dict[str, Any]) -> List[str]:
@@ -91,10 +104,16 @@ def extract_text_chunks_from_payload(payload: Dict[str, Any]) -> List[str]:
 
 
 def extract_fast_disclosure_text(raw_output: str) -> str:
+    return _extract_normalized_disclosure_text(normalize_newlines(raw_output))
+
+
+def _extract_normalized_disclosure_text(output: str) -> str:
+    # ``output`` already has "\n" line endings (run_cli_once and generate_fast_disclosure_once
+    # normalize what they return), so no second full-string copy is made here.
     json_chunks: List[str] = []
     plain_chunks: List[str] = []
 
-    for line in normalize_newlines(raw_output).split("\n"):
+    for line in output.split("\n"):
         stripped = line.strip()
         if not stripped:
             continue
@@ -120,19 +139,11 @@ def extract_fast_disclosure_text(raw_output: str) -> str:
 
     merged = "\n\n".join(deduped).strip()
 
-    marker_match = re.search(
-        r"<FAST_DISCLOSURE_START>(.*?)<FAST_DISCLOSURE_END>",
-        merged,
-        flags=re.DOTALL,
-    )
+    marker_match = _FAST_BLOCK_RE.search(merged)
     if marker_match:
         return marker_match.group(1).strip()
 
-    fence_match = re.search(
-        r"```(?:markdown|md|text)?\s*(.*?)```",
-        merged,
-        flags=re.DOTALL | re.IGNORECASE,
-    )
+    fence_match = _FENCE_RE.search(merged)
     if fence_match:
         return fence_match.group(1).strip()
 
@@ -167,30 +178,7 @@ def ensure_fast_disclosure_sections(content: str, invention_idea: str) -> str:
     return text.strip() + "\n"
 
 
-def write_simple_docx(path: Path, content: str) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-
-    paragraphs: List[str] = []
-    for line in normalize_newlines(content).split("\n"):
-        escaped = xml_escape(line)
-        if not escaped:
-            paragraphs.append("<w:p/>")
-            continue
-        paragraphs.append(f'<w:p><w:r><w:t xml:space="preserve">{escaped}</w:t></w:r></w:p>')
-
-    document_xml = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
-<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
-  <w:body>
-    {''.join(paragraphs)}
-    <w:sectPr>
-      <w:pgSz w:w="11906" w:h="16838"/>
-      <w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" w:header="720" w:footer="720" w:gutter="0"/>
-    </w:sectPr>
-  </w:body>
-</w:document>
-"""
-
-    content_types_xml = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+_CONTENT_TYPES_XML = b"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 <Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
   <Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
   <Default Extension="xml" ContentType="application/xml"/>
@@ -199,38 +187,90 @@ def write_simple_docx(path: Path, content: str) -> None:
   <Override PartName="/docProps/app.xml" ContentType="application/vnd.openxmlformats-officedocument.extended-properties+xml"/>
 </Types>
 """
-
-    rels_xml = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+_RELS_XML = b"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 <Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
   <Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
   <Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" Target="docProps/core.xml"/>
   <Relationship Id="rId3" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/extended-properties" Target="docProps/app.xml"/>
 </Relationships>
 """
-
-    now = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-    core_xml = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+_CORE_XML_TEMPLATE = b"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 <cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" xmlns:dcmitype="http://purl.org/dc/dcmitype/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
   <dc:title>Fast Mode Disclosure</dc:title>
   <dc:creator>PatentWriterAgent</dc:creator>
   <cp:lastModifiedBy>PatentWriterAgent</cp:lastModifiedBy>
-  <dcterms:created xsi:type="dcterms:W3CDTF">{now}</dcterms:created>
-  <dcterms:modified xsi:type="dcterms:W3CDTF">{now}</dcterms:modified>
+  <dcterms:created xsi:type="dcterms:W3CDTF">{NOW}</dcterms:created>
+  <dcterms:modified xsi:type="dcterms:W3CDTF">{NOW}</dcterms:modified>
 </cp:coreProperties>
 """
-
-    app_xml = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+_APP_XML = b"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 <Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties" xmlns:vt="http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes">
   <Application>PatentWriterAgent</Application>
 </Properties>
 """
+_DOCUMENT_XML_HEAD = b"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+  <w:body>
+    """
+_DOCUMENT_XML_TAIL = b"""
+    <w:sectPr>
+      <w:pgSz w:w="11906" w:h="16838"/>
+      <w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" w:header="720" w:footer="720" w:gutter="0"/>
+    </w:sectPr>
+  </w:body>
+</w:document>
+"""
+_EMPTY_PARAGRAPH_XML = b"<w:p/>"
+_PARAGRAPH_XML_PREFIX = b'<w:p><w:r><w:t xml:space="preserve">'
+_PARAGRAPH_XML_SUFFIX = b"</w:t></w:r></w:p>"
+
+
+def iter_paragraph_xml(content: str) -> Iterator[bytes]:
+    """Yield the encoded WordprocessingML for each line of ``content``, one paragraph at a time."""
+    for line in normalize_newlines(content).split("\n"):
+        if not line:
+            yield _EMPTY_PARAGRAPH_XML
+            continue
+        yield _PARAGRAPH_XML_PREFIX + xml_escape(line).encode("utf-8") + _PARAGRAPH_XML_SUFFIX
+
+
+# Fixed entry timestamps skip a localtime() call per entry and keep the package bytes stable.
+_DOCX_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+# The XML is highly repetitive, so the fastest deflate level loses almost nothing in size.
+_DOCX_COMPRESSLEVEL = 1
+
+
+def _docx_entry(name: str, compress_type: int = zipfile.ZIP_DEFLATED) -> zipfile.ZipInfo:
+    # Built per call: ZipFile records sizes/CRC on the ZipInfo, so instances can't be shared.
+    info = zipfile.ZipInfo(name, date_time=_DOCX_DATE_TIME)
+    info.compress_type = compress_type
+    info.external_attr = 0o600 << 16
+    return info
+
+
+def write_simple_docx(path: Path, content: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    now = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ").encode("ascii")
+    core_xml = _CORE_XML_TEMPLATE.replace(b"{NOW}", now)
 
-    with zipfile.ZipFile(path, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
-        archive.writestr("[Content_Types].xml", content_types_xml)
-        archive.writestr("_rels/.rels", rels_xml)
-        archive.writestr("docProps/core.xml", core_xml)
-        archive.writestr("docProps/app.xml", app_xml)
-        archive.writestr("word/document.xml", document_xml)
+    with zipfile.ZipFile(
+        path, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=_DOCX_COMPRESSLEVEL
+    ) as archive:
+        # The sub-KB package parts are stored: setting up zlib costs more than it saves there.
+        archive.writestr(_docx_entry("[Content_Types].xml", zipfile.ZIP_STORED), _CONTENT_TYPES_XML)
+        archive.writestr(_docx_entry("_rels/.rels", zipfile.ZIP_STORED), _RELS_XML)
+        archive.writestr(_docx_entry("docProps/core.xml", zipfile.ZIP_STORED), core_xml)
+        archive.writestr(_docx_entry("docProps/app.xml", zipfile.ZIP_STORED), _APP_XML)
+
+        # Stream the document body so the full document.xml never exists in memory at once.
+        # Opened by name so the entry takes the archive's compression and level; a bare
+        # ZipInfo(name) already carries the fixed 1980-01-01 timestamp.
+        with archive.open("word/document.xml", mode="w") as entry:
+            entry.write(_DOCUMENT_XML_HEAD)
+            for paragraph in iter_paragraph_xml(content):
+                entry.write(paragraph)
+            entry.write(_DOCUMENT_XML_TAIL)
 
 
 def generate_fast_disclosure_once(
@@ -299,49 +339,157 @@ def run_cli_once(
     return True, output, "", command
 
 
+FAST_CACHE_DIR = OUTPUT_DIR / "fast_cache"
+FAST_CACHE_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+FAST_CACHE_MAX_ENTRIES = 256
+
+
+def fast_cache_key(execution_mode: str, backend: str, prompt: str) -> str:
+    return hashlib.blake2b(f"{execution_mode}|{backend}|{prompt}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def fast_cache_get(key: str) -> Optional[str]:
+    path = FAST_CACHE_DIR / f"{key}.md"
+    try:
+        if time.time() - path.stat().st_mtime > FAST_CACHE_MAX_AGE_SECONDS:
+            path.unlink()
+            return None
+        return path.read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+
+def _prune_fast_cache() -> None:
+    """Drop entries past the age limit, then all but the newest ones, leaving room for one more."""
+    try:
+        entries = [
+            (entry.stat().st_mtime, entry.path)
+            for entry in os.scandir(FAST_CACHE_DIR)
+            if entry.is_file() and entry.name.endswith(".md")
+        ]
+    except OSError:
+        return
+    entries.sort(reverse=True)
+    cutoff = time.time() - FAST_CACHE_MAX_AGE_SECONDS
+    for index, (mtime, path) in enumerate(entries):
+        if mtime < cutoff or index >= FAST_CACHE_MAX_ENTRIES - 1:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def fast_cache_set(key: str, text: str) -> None:
+    # Written to a temp file and swapped in, so a concurrent fast_cache_get never reads a partial entry.
+    temp_name: Optional[str] = None
+    try:
+        FAST_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _prune_fast_cache()
+        handle, temp_name = tempfile.mkstemp(dir=FAST_CACHE_DIR, prefix=f".{key}.", suffix=".part")
+        with os.fdopen(handle, "w", encoding="utf-8") as temp_file:
+            temp_file.write(text)
+        os.replace(temp_name, FAST_CACHE_DIR / f"{key}.md")
+    except OSError:
+        pass
+    finally:
+        if temp_name is not None and os.path.exists(temp_name):
+            os.unlink(temp_name)
+
+
+def write_fast_disclosure_files(session_id: str, expanded_text: str) -> Tuple[Path, bytes]:
+    target_dir = DATA_DIR / "uploads" / session_id
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    markdown_path = target_dir / "fast_disclosure.md"
+    docx_path = target_dir / "fast_disclosure.docx"
+
+    markdown_path.write_text(expanded_text, encoding="utf-8")
+    write_simple_docx(docx_path, expanded_text)
+
+    event = format_log_event(
+        "极速模式预处理完成",
+        f"生成文件：{to_display_path(markdown_path)}\n生成文件：{to_display_path(docx_path)}",
+    )
+    return docx_path, event
+
+
 def prepare_fast_mode_input(
     session_id: str,
     execution_mode: str,
     runtime_backend: str,
     cli_backend: str,
     invention_idea: str,
+    regenerate: bool = False,
 ) -> Tuple[bool, str, Optional[Path]]:
+    """Expand the idea into a disclosure; ``regenerate`` skips the cached expansion and replaces it."""
     idea = invention_idea.strip()
     if not idea:
         return False, "极速模式需要提供详细的发明构思。", None
 
+    # Events are collected and flushed with a single append on every exit path.
+    log_chunks: List[bytes] = []
+    try:
+        return _prepare_fast_mode_input(
+            session_id, execution_mode, runtime_backend, cli_backend, idea, regenerate, log_chunks
+        )
+    finally:
+        append_log_bytes(session_id, *log_chunks)
+
+
+def _prepare_fast_mode_input(
+    session_id: str,
+    execution_mode: str,
+    runtime_backend: str,
+    cli_backend: str,
+    idea: str,
+    regenerate: bool,
+    log_chunks: List[bytes],
+) -> Tuple[bool, str, Optional[Path]]:
     prompt = build_fast_mode_prompt(idea)
 
+    # Resubmitting the same idea on the same backend reuses the earlier expansion
+    # instead of paying for another LLM call.
+    backend = cli_backend if execution_mode == EXEC_MODE_CLI else runtime_backend
+    cache_key = fast_cache_key(execution_mode, backend, prompt)
+    cached_text = None if regenerate else fast_cache_get(cache_key)
+    if cached_text is not None:
+        log_chunks.append(format_log_event("极速模式预处理命中缓存", f"Cache key: {cache_key}"))
+        docx_path, event = write_fast_disclosure_files(session_id, cached_text)
+        log_chunks.append(event)
+        return True, f"极速模式复用了已缓存的交底书：{to_display_path(docx_path)}", docx_path
+
     if execution_mode == EXEC_MODE_CLI:
         ok, raw_output, error_message, command = run_cli_once(
             cli_backend=cli_backend,
             session_id=str(uuid.uuid4()),
             prompt=prompt,
         )
-        append_log_event(
-            session_id,
-            "极速模式预处理开始",
-            f"Command: {' '.join(shlex.quote(item) for item in command)}",
+        log_chunks.append(
+            format_log_event(
+                "极速模式预处理开始",
+                f"Command: {' '.join(shlex.quote(item) for item in command)}",
+            )
         )
     else:
         ok, raw_output, error_message = generate_fast_disclosure_once(
             runtime_backend=runtime_backend,
             invention_idea=idea,
         )
-        append_log_event(
-            session_id,
-            "极速模式预处理开始",
-            f"Runtime backend: {safe_runtime_label(runtime_backend)}",
+        log_chunks.append(
+            format_log_event(
+                "极速模式预处理开始",
+                f"Runtime backend: {safe_runtime_label(runtime_backend)}",
+            )
         )
 
     if raw_output.strip():
-        append_log_event(session_id, "预处理输出内容", raw_output)
+        log_chunks.append(format_log_event("预处理输出内容", raw_output))
 
     if not ok:
-        append_log_event(session_id, "预处理失败", error_message)
+        log_chunks.append(format_log_event("预处理失败", error_message))
         return False, error_message, None
 
-    expanded_text = extract_fast_disclosure_text(raw_output)
+    expanded_text = _extract_normalized_disclosure_text(raw_output)
     expanded_text = ensure_fast_disclosure_sections(expanded_text, idea)
 
     if len(expanded_text.strip()) < 80:
@@ -349,22 +497,10 @@ def prepare_fast_mode_input(
             "极速模式生成的交底书内容过少。\n"
             "请提供更多细节后重试。"
         )
-        append_log_event(session_id, "预处理失败", message)
+        log_chunks.append(format_log_event("预处理失败", message))
         return False, message, None
 
-    target_dir = DATA_DIR / "uploads" / session_id
-    target_dir.mkdir(parents=True, exist_ok=True)
-
-    markdown_path = target_dir / "fast_disclosure.md"
-    docx_path = target_dir / "fast_disclosure.docx"
-
-    markdown_path.write_text(expanded_text, encoding="utf-8")
-    write_simple_docx(docx_path, expanded_text)
-
-    append_log_event(
-        session_id,
-        "极速模式预处理完成",
-        f"生成文件：{to_display_path(markdown_path)}\n生成文件：{to_display_path(docx_path)}",
-    )
-
+    fast_cache_set(cache_key, expanded_text)
+    docx_path, event = write_fast_disclosure_files(session_id, expanded_text)
+    log_chunks.append(event)
     return True, f"极速模式成功生成技术交底书文件：{to_display_path(docx_path)}", docx_path
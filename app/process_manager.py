@@ -4,9 +4,12 @@ from __future__ import annotations
 
 import os
 import signal
+import subprocess
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import psutil
 
@@ -29,9 +32,27 @@ from app.backend import (
 from datetime import datetime
 
 
+# Runners started by this server process. poll() answers liveness with a single
+# waitpid() and reaps the child, so finished runs do not linger as zombies.
+_SPAWNED_PROCESSES: Dict[int, subprocess.Popen] = {}
+
+
+def register_spawned_process(process: subprocess.Popen) -> None:
+    _SPAWNED_PROCESSES[process.pid] = process
+
+
 def is_pid_running(pid: int) -> bool:
     if pid <= 0:
         return False
+
+    spawned = _SPAWNED_PROCESSES.get(pid)
+    if spawned is not None:
+        if spawned.poll() is None:
+            return True
+        _SPAWNED_PROCESSES.pop(pid, None)
+        return False
+
+    # Recovered from a .pid.json written before a restart: ask the OS.
     try:
         process = psutil.Process(pid)
         return process.is_running() and process.status() != psutil.STATUS_ZOMBIE
@@ -74,14 +95,48 @@ def get_running_metadata(session_id: str) -> Optional[Dict[str, Any]]:
     return metadata
 
 
-def cleanup_stale_pid_files() -> None:
+def list_running_metadata() -> Dict[str, Dict[str, Any]]:
+    """Metadata of every running session, keyed by session ID, from one directory pass."""
+    running: Dict[str, Dict[str, Any]] = {}
     for pid_file in OUTPUT_DIR.glob("*.pid.json"):
-        metadata = read_json_file(pid_file)
+        session_id = pid_file.name[: -len(".pid.json")]
+        if not is_valid_uuid(session_id):
+            continue
+        metadata = get_running_metadata(session_id)
+        if metadata:
+            running[session_id] = metadata
+    return running
+
+
+def _unlink_quietly(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def cleanup_stale_pid_files() -> None:
+    # A pid file last written before this boot cannot describe a live process,
+    # so it is dropped without decoding its JSON or probing the pid.
+    boot_time = psutil.boot_time()
+    try:
+        with os.scandir(OUTPUT_DIR) as entries:
+            pid_entries = [entry for entry in entries if entry.name.endswith(".pid.json")]
+    except OSError:
+        return
+
+    for entry in pid_entries:
+        try:
+            mtime = entry.stat().st_mtime
+        except OSError:
+            continue
+        if mtime < boot_time:
+            _unlink_quietly(entry.path)
+            continue
+
+        metadata = read_json_file(Path(entry.path))
         if not metadata:
-            try:
-                pid_file.unlink()
-            except OSError:
-                pass
+            _unlink_quietly(entry.path)
             continue
 
         try:
@@ -89,13 +144,8 @@ def cleanup_stale_pid_files() -> None:
         except (TypeError, ValueError):
             pid = 0
 
-        if is_pid_running(pid):
-            continue
-
-        try:
-            pid_file.unlink()
-        except OSError:
-            pass
+        if not is_pid_running(pid):
+            _unlink_quietly(entry.path)
 
 
 def write_pid_metadata(
@@ -146,10 +196,10 @@ def terminate_pid_tree(pid: int) -> Tuple[bool, str]:
 
     try:
         parent = psutil.Process(pid)
+        targets = parent.children(recursive=True) + [parent]
     except psutil.NoSuchProcess:
         return True, "Process already exited."
 
-    targets = parent.children(recursive=True) + [parent]
     for proc in targets:
         try:
             proc.terminate()
@@ -166,12 +216,20 @@ def terminate_pid_tree(pid: int) -> Tuple[bool, str]:
     return True, "Process tree terminated."
 
 
+def _process_cmdline(process: psutil.Process) -> List[str]:
+    # process_iter(attrs=...) has already read the cmdline into ``info`` (None if denied).
+    info = getattr(process, "info", None)
+    if info is not None and "cmdline" in info:
+        return info["cmdline"] or []
+    return process.cmdline()
+
+
 def is_cli_process(process: psutil.Process, process_keyword: str) -> bool:
     try:
         name = (process.name() or "").lower()
         if process_keyword in name:
             return True
-        cmdline = process.cmdline()
+        cmdline = _process_cmdline(process)
     except (psutil.NoSuchProcess, psutil.AccessDenied):
         return False
 
@@ -181,12 +239,7 @@ def is_cli_process(process: psutil.Process, process_keyword: str) -> bool:
     return False
 
 
-def is_runner_process(process: psutil.Process) -> bool:
-    try:
-        cmdline = process.cmdline()
-    except (psutil.NoSuchProcess, psutil.AccessDenied):
-        return False
-
+def _is_runner_cmdline(cmdline: List[str]) -> bool:
     for item in cmdline:
         name = Path(item).name.lower()
         if name in {"pipeline_runner.py", "pipeline_runner"}:
@@ -196,22 +249,64 @@ def is_runner_process(process: psutil.Process) -> bool:
     return False
 
 
+def is_runner_process(process: psutil.Process) -> bool:
+    try:
+        cmdline = _process_cmdline(process)
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return False
+    return _is_runner_cmdline(cmdline)
+
+
+def _iter_proc_cmdlines() -> Iterator[Tuple[int, bytes]]:
+    """Yield (pid, raw NUL-separated cmdline) straight from /proc, skipping vanished pids."""
+    with os.scandir("/proc") as entries:
+        for entry in entries:
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry.name}/cmdline", "rb") as handle:
+                    yield int(entry.name), handle.read()
+            except OSError:
+                continue
+
+
+def _terminate_pid_trees(pids: List[int]) -> int:
+    if not pids:
+        return 0
+    # Each tree can wait several seconds for its processes to exit, so stop them concurrently.
+    with ThreadPoolExecutor(max_workers=min(16, len(pids))) as pool:
+        return sum(1 for ok, _ in pool.map(terminate_pid_tree, pids) if ok)
+
+
 def cleanup_all_runner_processes() -> Tuple[int, int]:
     current_pid = os.getpid()
-    killed = 0
     scanned = 0
-
-    for process in psutil.process_iter(["pid"]):
-        pid = process.info.get("pid")
-        if not pid or pid == current_pid:
-            continue
-        scanned += 1
-        if not is_runner_process(process):
-            continue
-        ok, _ = terminate_pid_tree(pid)
-        if ok:
-            killed += 1
-
+    candidates: List[int] = []
+
+    if sys.platform.startswith("linux") and os.path.isdir("/proc"):
+        # Reading /proc directly skips psutil's per-process object setup; the byte
+        # pre-filter means only plausible matches are decoded.
+        for pid, raw_cmdline in _iter_proc_cmdlines():
+            if pid == current_pid:
+                continue
+            scanned += 1
+            if b"pipeline_runner" not in raw_cmdline.lower():
+                continue
+            text = raw_cmdline.decode("utf-8", errors="replace").rstrip("\0")
+            # Same as psutil: processes that rewrite argv may use spaces as separators.
+            cmdline = text.split("\0") if "\0" in text else text.split(" ")
+            if _is_runner_cmdline(cmdline):
+                candidates.append(pid)
+    else:
+        for process in psutil.process_iter(["pid", "cmdline"]):
+            pid = process.info.get("pid")
+            if not pid or pid == current_pid:
+                continue
+            scanned += 1
+            if is_runner_process(process):
+                candidates.append(pid)
+
+    killed = _terminate_pid_trees(candidates)
     cleanup_stale_pid_files()
     return killed, scanned
 
@@ -220,20 +315,18 @@ def cleanup_all_cli_processes(cli_backend: str) -> Tuple[int, int]:
     from app.backend import get_cli_process_keyword
 
     current_pid = os.getpid()
-    killed = 0
     scanned = 0
+    candidates: List[int] = []
     keyword = get_cli_process_keyword(cli_backend)
 
-    for process in psutil.process_iter(["pid"]):
+    for process in psutil.process_iter(["pid", "name", "cmdline"]):
         pid = process.info.get("pid")
         if not pid or pid == current_pid:
             continue
         scanned += 1
-        if not is_cli_process(process, keyword):
-            continue
-        ok, _ = terminate_pid_tree(pid)
-        if ok:
-            killed += 1
+        if is_cli_process(process, keyword):
+            candidates.append(pid)
 
+    killed = _terminate_pid_trees(candidates)
     cleanup_stale_pid_files()
     return killed, scanned
@@ -2,15 +2,16 @@
 
 from __future__ import annotations
 
-import io
+import os
 import shlex
+import tempfile
 import zipfile
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 
 from app.config import OUTPUT_DIR
-from app.utils import is_valid_uuid, tail_text_lines
+from app.utils import is_valid_uuid, read_tail_block
 
 
 def get_log_path(session_id: str) -> Path:
@@ -25,23 +26,34 @@ def get_session_dir(session_id: str) -> Path:
     return OUTPUT_DIR / f"temp_{session_id}"
 
 
-def list_sessions() -> List[str]:
-    scores: Dict[str, float] = {}
-
-    for log_file in OUTPUT_DIR.glob("*.log"):
-        session_id = log_file.stem
-        if is_valid_uuid(session_id):
-            scores[session_id] = max(scores.get(session_id, 0.0), log_file.stat().st_mtime)
+def _session_id_from_entry_name(name: str) -> Optional[str]:
+    if name.endswith(".pid.json"):
+        session_id = name[: -len(".pid.json")]
+    elif name.endswith(".log"):
+        session_id = name[: -len(".log")]
+    elif name.startswith("temp_"):
+        session_id = name[len("temp_"):]
+    else:
+        return None
+    return session_id if is_valid_uuid(session_id) else None
 
-    for temp_dir in OUTPUT_DIR.glob("temp_*"):
-        session_id = temp_dir.name.replace("temp_", "", 1)
-        if is_valid_uuid(session_id):
-            scores[session_id] = max(scores.get(session_id, 0.0), temp_dir.stat().st_mtime)
 
-    for pid_file in OUTPUT_DIR.glob("*.pid.json"):
-        session_id = pid_file.name[: -len(".pid.json")]
-        if is_valid_uuid(session_id):
-            scores[session_id] = max(scores.get(session_id, 0.0), pid_file.stat().st_mtime)
+def list_sessions() -> List[str]:
+    # Logs, temp_ directories and pid files all mark a session; one scandir pass covers them.
+    scores: Dict[str, float] = {}
+    try:
+        with os.scandir(OUTPUT_DIR) as entries:
+            for entry in entries:
+                session_id = _session_id_from_entry_name(entry.name)
+                if session_id is None:
+                    continue
+                try:
+                    mtime = entry.stat().st_mtime
+                except OSError:
+                    continue
+                scores[session_id] = max(scores.get(session_id, 0.0), mtime)
+    except OSError:
+        return []
 
     return [
         session_id
@@ -49,61 +61,169 @@ def list_sessions() -> List[str]:
     ]
 
 
-def build_session_archive(session_id: str) -> Optional[bytes]:
+def scan_log_stats() -> Dict[str, os.stat_result]:
+    # One directory pass instead of an exists()+stat() pair per session row.
+    stats: Dict[str, os.stat_result] = {}
+    try:
+        with os.scandir(OUTPUT_DIR) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".log"):
+                    continue
+                session_id = entry.name[: -len(".log")]
+                if not is_valid_uuid(session_id):
+                    continue
+                try:
+                    stats[session_id] = entry.stat()
+                except OSError:
+                    continue
+    except OSError:
+        return {}
+    return stats
+
+
+def session_fingerprint(session_id: str) -> Tuple[int, int, int]:
+    """Return (latest mtime_ns, total bytes, file count) over everything archived."""
+    latest = 0
+    total_size = 0
+    file_count = 0
+    pending = [str(get_session_dir(session_id))]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    latest = max(latest, stat.st_mtime_ns)
+                    total_size += stat.st_size
+                    file_count += 1
+        except OSError:
+            continue
+
+    try:
+        log_stat = get_log_path(session_id).stat()
+    except OSError:
+        return latest, total_size, file_count
+    return max(latest, log_stat.st_mtime_ns), total_size + log_stat.st_size, file_count + 1
+
+
+# Container formats that are compressed already; deflating them again costs CPU for ~no gain.
+_STORED_SUFFIXES = frozenset(
+    {".docx", ".xlsx", ".pptx", ".zip", ".gz", ".xz", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".pdf"}
+)
+
+
+def write_session_archive(session_id: str, destination: BinaryIO) -> int:
+    """Zip the session directory and log into ``destination``; returns the number of files written."""
     session_dir = get_session_dir(session_id)
     log_path = get_log_path(session_id)
-    if not session_dir.exists() and not log_path.exists():
-        return None
-
-    buffer = io.BytesIO()
     file_count = 0
-    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+    with zipfile.ZipFile(destination, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
         if session_dir.exists():
             for file_path in sorted(session_dir.rglob("*")):
                 if not file_path.is_file():
                     continue
                 arcname = Path(f"temp_{session_id}") / file_path.relative_to(session_dir)
-                archive.write(file_path, arcname.as_posix())
+                compress_type = zipfile.ZIP_STORED if file_path.suffix.lower() in _STORED_SUFFIXES else None
+                archive.write(file_path, arcname.as_posix(), compress_type=compress_type)
                 file_count += 1
 
         if log_path.exists():
             archive.write(log_path, log_path.name)
             file_count += 1
+    return file_count
 
-    if file_count == 0:
-        return None
-    return buffer.getvalue()
 
+def save_session_archive(session_id: str, target: Path) -> bool:
+    """Write the session archive to ``target`` on disk; returns False when there is nothing to archive.
 
-def append_log_banner(session_id: str, command: List[str]) -> None:
-    log_path = get_log_path(session_id)
-    with log_path.open("a", encoding="utf-8") as handle:
-        handle.write(
-            f"\n=== [{datetime.now().isoformat(timespec='seconds')}] session {session_id} started ===\n"
-        )
-        handle.write(f"Command: {' '.join(shlex.quote(item) for item in command)}\n")
+    Compressed data goes straight to a sibling temp file that replaces ``target`` once complete,
+    so the archive is never held in memory and readers never see a partial file.
+    """
+    if not get_session_dir(session_id).exists() and not get_log_path(session_id).exists():
+        return False
 
+    target.parent.mkdir(parents=True, exist_ok=True)
+    handle, temp_name = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".part")
+    try:
+        with os.fdopen(handle, "wb") as temp_file:
+            file_count = write_session_archive(session_id, temp_file)
+        if file_count == 0:
+            return False
+        os.replace(temp_name, target)
+        return True
+    finally:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
 
-def append_log_event(session_id: str, note: str, body: str = "") -> None:
-    log_path = get_log_path(session_id)
-    with log_path.open("a", encoding="utf-8") as handle:
-        handle.write(f"\n=== [{datetime.now().isoformat(timespec='seconds')}] {note} ===\n")
-        if body:
-            handle.write(body)
-            if not body.endswith("\n"):
-                handle.write("\n")
 
+def _log_stamp() -> str:
+    return datetime.now().isoformat(timespec="seconds")
 
-def append_log_footer(session_id: str, note: str) -> None:
-    log_path = get_log_path(session_id)
-    with log_path.open("a", encoding="utf-8") as handle:
-        handle.write(f"\n=== [{datetime.now().isoformat(timespec='seconds')}] {note} ===\n")
 
+def format_log_banner(session_id: str, command: List[str]) -> bytes:
+    return (
+        f"\n=== [{_log_stamp()}] session {session_id} started ===\n"
+        f"Command: {' '.join(shlex.quote(item) for item in command)}\n"
+    ).encode("utf-8")
 
-def tail_log_lines(path: Path, max_lines: int) -> List[str]:
-    if not path.exists():
-        return []
-    return tail_text_lines(path, max_lines)
+
+def format_log_event(note: str, body: str = "") -> bytes:
+    text = f"\n=== [{_log_stamp()}] {note} ===\n"
+    if body:
+        text += body if body.endswith("\n") else body + "\n"
+    return text.encode("utf-8")
+
+
+def append_log_bytes(session_id: str, *chunks: bytes) -> None:
+    """Append pre-encoded chunks to the session log with a single open/close."""
+    if not chunks:
+        return
+    with get_log_path(session_id).open("ab") as handle:
+        handle.write(b"".join(chunks))
+
+
+def append_log_footer(session_id: str, note: str) -> None:
+    append_log_bytes(session_id, format_log_event(note))
+
+
+def read_log_lines_since(
+    path: Path,
+    offset: int,
+    max_bytes: int = 1024 * 1024,
+    max_lines: Optional[int] = None,
+) -> Tuple[List[str], int]:
+    """Return complete lines appended after ``offset`` and the offset just past them.
+
+    At most the trailing ``max_bytes`` of the new data are read, and with ``max_lines``
+    only as many blocks from the end as cover that many lines. An unterminated last
+    line is left for the next call once its newline has been written.
+    """
+    try:
+        with path.open("rb") as handle:
+            end = handle.seek(0, os.SEEK_END)
+            lower = max(offset, end - max_bytes)
+            if max_lines is None:
+                start = lower
+                handle.seek(start)
+                data = handle.read(end - start)
+            else:
+                start, data = read_tail_block(handle, lower, end, max_lines)
+    except OSError:
+        return [], offset
+
+    complete = data.rfind(b"\n") + 1
+    if complete == 0:
+        return [], offset
+
+    chunk = data[:complete]
+    if start > offset:
+        # Skipped ahead of the old offset: drop the partial first line.
+        chunk = chunk[chunk.find(b"\n") + 1 :]
+    return chunk.decode("utf-8", errors="replace").splitlines(keepends=True), start + complete
 
 
 def save_uploaded_file(uploaded_file: Any, session_id: str) -> Path:
@@ -3,19 +3,34 @@
 from __future__ import annotations
 
 import json
-import os
 import uuid
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 
 from app.config import ROOT_DIR
 
+try:
+    from orjson import OPT_INDENT_2
+    from orjson import dumps as _orjson_dumps
+    from orjson import loads as _json_loads
+
+    def _json_dumps(payload: Dict[str, Any]) -> bytes:
+        return _orjson_dumps(payload, option=OPT_INDENT_2)
+
+except ImportError:  # orjson is optional; stdlib json produces the same layout
+    _json_loads = json.loads
+
+    def _json_dumps(payload: Dict[str, Any]) -> bytes:
+        return json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+
 
 def normalize_newlines(text: str) -> str:
     return text.replace("\r\n", "\n").replace("\r", "\n")
 
 
+@lru_cache(maxsize=1024)
 def is_valid_uuid(value: str) -> bool:
     try:
         uuid.UUID(value)
@@ -24,6 +39,7 @@ def is_valid_uuid(value: str) -> bool:
         return False
 
 
+@lru_cache(maxsize=256)
 def to_display_path(path: Path) -> str:
     try:
         return str(path.relative_to(ROOT_DIR))
@@ -31,6 +47,7 @@ def to_display_path(path: Path) -> str:
         return str(path)
 
 
+@lru_cache(maxsize=256)
 def resolve_workspace_path(value: str) -> Path:
     path = Path(value).expanduser()
     if not path.is_absolute():
@@ -39,34 +56,39 @@ def resolve_workspace_path(value: str) -> Path:
 
 
 def read_json_file(path: Path) -> Optional[Dict[str, Any]]:
-    if not path.exists():
-        return None
+    # A missing file surfaces as FileNotFoundError (an OSError), so no separate exists() stat.
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except (json.JSONDecodeError, OSError):
+        return _json_loads(path.read_bytes())
+    except (ValueError, OSError):  # JSONDecodeError and bad UTF-8 are both ValueErrors
         return None
 
 
 def write_json_file(path: Path, payload: Dict[str, Any]) -> None:
-    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    path.write_bytes(_json_dumps(payload))
+
+
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
 
 
 def human_file_size(num_bytes: int) -> str:
-    units = ["B", "KB", "MB", "GB", "TB"]
-    size = float(num_bytes)
-    for unit in units:
-        if size < 1024 or unit == units[-1]:
-            if unit == "B":
-                return f"{int(size)} {unit}"
-            return f"{size:.1f} {unit}"
-        size /= 1024
-    return f"{num_bytes} B"
+    num_bytes = int(num_bytes)
+    if num_bytes < 1024:
+        return f"{num_bytes} B"
+    # Each unit spans 10 bits, so the bit length picks the unit without a divide loop.
+    index = min((num_bytes.bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+    return f"{num_bytes / (1 << (index * 10)):.1f} {_SIZE_UNITS[index]}"
 
 
 def format_timestamp(timestamp: Optional[float]) -> str:
     if timestamp is None:
         return "-"
-    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+    # Whole seconds are all that is displayed, so flooring first gives the cache real hits.
+    return _format_epoch_seconds(int(timestamp))
+
+
+@lru_cache(maxsize=256)
+def _format_epoch_seconds(seconds: int) -> str:
+    return datetime.fromtimestamp(seconds).strftime("%Y-%m-%d %H:%M:%S")
 
 
 def xml_escape(value: str) -> str:
@@ -83,22 +105,11 @@ def read_text_preview(path: Path, limit: int = 20000) -> tuple[str, bool]:
     if limit <= 0:
         return "", False
 
+    # One bounded read: a single character past the limit tells us the file was truncated,
+    # without a separate stat or loading the whole file.
     try:
-        size = path.stat().st_size
-    except OSError:
-        size = None
-
-    # Fast path for large artifacts: only read the first chunk we need.
-    if size is not None and size > limit:
-        try:
-            with path.open("r", encoding="utf-8", errors="replace") as handle:
-                preview = handle.read(limit)
-            return preview, True
-        except OSError:
-            return "", False
-
-    try:
-        content = path.read_text(encoding="utf-8", errors="replace")
+        with path.open("r", encoding="utf-8", errors="replace") as handle:
+            content = handle.read(limit + 1)
     except OSError:
         return "", False
 
@@ -123,37 +134,25 @@ def clamp_int(value: int, minimum: int, maximum: int) -> int:
     return value
 
 
-def tail_text_lines(path: Path, max_lines: int) -> list[str]:
-    if max_lines <= 0:
-        return []
-
-    try:
-        size = path.stat().st_size
-    except OSError:
-        return []
-
-    if size == 0:
-        return []
-
-    chunk_size = 8192
-    max_bytes = 1024 * 1024
-    read_size = min(size, min(max(size // 8, chunk_size), max_bytes))
-
-    try:
-        with path.open("rb") as handle:
-            if read_size < size:
-                handle.seek(-read_size, os.SEEK_END)
-            data = handle.read(read_size)
-    except OSError:
-        return []
-
-    text = data.decode("utf-8", errors="replace")
-
-    # Drop partial first line when reading from middle of file.
-    if read_size < size and "\n" in text:
-        text = text.split("\n", 1)[1]
-
-    lines = text.splitlines(keepends=True)
-    if len(lines) <= max_lines:
-        return lines
-    return lines[-max_lines:]
+_TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def read_tail_block(handle: BinaryIO, lower: int, end: int, max_lines: int) -> Tuple[int, bytes]:
+    """Read backwards from ``end`` in fixed blocks until ``max_lines`` lines are covered.
+
+    Stops once more than ``max_lines`` newlines have been seen (so the first line
+    boundary is known) or ``lower`` is reached. Returns the start offset and the bytes
+    from there to ``end``.
+    """
+    blocks: List[bytes] = []
+    newlines = 0
+    position = end
+    while position > lower and newlines <= max_lines:
+        step = min(_TAIL_BLOCK_SIZE, position - lower)
+        position -= step
+        handle.seek(position)
+        block = handle.read(step)
+        blocks.append(block)
+        newlines += block.count(b"\n")
+    blocks.reverse()
+    return position, b"".join(blocks)
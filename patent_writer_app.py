@@ -5,14 +5,26 @@ from __future__ import annotations
 
 import json
 import os
+import re
 import subprocess
+import tempfile
+import threading
 import time
 import uuid
+from collections import deque
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from types import MappingProxyType
+from typing import Any, Callable, Deque, Dict, List, Mapping, Optional, Tuple
 
+import pyarrow as pa
 import streamlit as st
 
+try:
+    from orjson import loads as json_loads
+except ImportError:  # orjson is an optional speed-up for log rendering
+    from json import loads as json_loads
+
 from runtime_client import (
     DEFAULT_RUNTIME_BACKEND,
     RUNTIME_CONFIGS,
@@ -61,20 +73,24 @@ from app.backend import (
     get_cli_label,
 )
 from app.session import (
-    append_log_banner,
     append_log_footer,
-    build_session_archive,
+    format_log_banner,
     get_log_path,
     get_session_dir,
     list_sessions,
+    read_log_lines_since,
+    save_session_archive,
     save_uploaded_file,
-    tail_log_lines,
+    scan_log_stats,
+    session_fingerprint,
 )
 from app.process_manager import (
     cleanup_all_cli_processes,
     cleanup_all_runner_processes,
     cleanup_stale_pid_files,
     get_running_metadata,
+    list_running_metadata,
+    register_spawned_process,
     remove_pid_metadata,
     terminate_pid_tree,
     write_pid_metadata,
@@ -102,70 +118,200 @@ def get_default_input_path() -> Path:
     return files[0] if files else candidate
 
 
-def format_stream_json_line(line: str) -> str:
-    text = line.strip()
+_EMPTY_MAPPING: Mapping[str, Any] = MappingProxyType({})
+
+
+def _format_assistant_event(payload: Dict[str, Any]) -> Optional[str]:
+    message = payload.get("message") or _EMPTY_MAPPING
+    content = message.get("content") or ()
+    rendered: List[str] = []
+    for item in content:
+        item_type = item.get("type")
+        if item_type == "text":
+            body = str(item.get("text", "")).strip()
+            if body:
+                rendered.append(body)
+        elif item_type == "tool_use":
+            rendered.append(f"[tool_use] {item.get('name', 'unknown')}")
+    return "\n".join(rendered)
+
+
+def _format_result_event(payload: Dict[str, Any]) -> Optional[str]:
+    result = str(payload.get("result", "")).strip()
+    if result:
+        return f"[result] {result}"
+    return "[result] completed"
+
+
+def _format_item_completed_event(payload: Dict[str, Any]) -> Optional[str]:
+    item = payload.get("item") or _EMPTY_MAPPING
+    if item.get("type") == "agent_message":
+        return str(item.get("text", "")).strip()
+    return None
+
+
+# Handlers return None to fall back to the raw line.
+_STREAM_EVENT_FORMATTERS: Dict[str, Callable[[Dict[str, Any]], Optional[str]]] = {
+    "assistant": _format_assistant_event,
+    "result": _format_result_event,
+    "item.completed": _format_item_completed_event,
+}
+
+
+# Claude and Codex both emit "type" as the first key. Sniffing it lets lines no handler
+# cares about (e.g. multi-KB "user" tool results) skip the JSON parse entirely.
+_LEADING_TYPE_RE = re.compile(r'\{\s*"type"\s*:\s*"([^"\\]*)"')
+
+
+def _format_stream_line(line: str) -> str:
+    # Stream events start at column 0, so only trailing whitespace needs trimming;
+    # indented plain-text lines (e.g. tracebacks) keep their indentation.
+    text = line.rstrip()
     if not text:
         return ""
 
-    if not text.startswith("{"):
+    if text[0] != "{":
+        return text
+
+    # Only objects that open with a "type" key naming a formatted event are worth parsing.
+    match = _LEADING_TYPE_RE.match(text)
+    if match is None or match.group(1) not in _STREAM_EVENT_FORMATTERS:
         return text
 
     try:
-        payload = json.loads(text)
-    except json.JSONDecodeError:
+        payload = json_loads(text)
+    except json.JSONDecodeError:  # orjson.JSONDecodeError subclasses this
         return text
 
     event_type = payload.get("type")
+    handler = _STREAM_EVENT_FORMATTERS.get(event_type) if isinstance(event_type, str) else None
+    if handler is None:
+        return text
 
-    if event_type == "assistant":
-        message = payload.get("message") or {}
-        content = message.get("content") or []
-        rendered: List[str] = []
-        for item in content:
-            item_type = item.get("type")
-            if item_type == "text":
-                body = str(item.get("text", "")).strip()
-                if body:
-                    rendered.append(body)
-            elif item_type == "tool_use":
-                rendered.append(f"[tool_use] {item.get('name', 'unknown')}")
-        return "\n".join(rendered)
-
-    if event_type == "result":
-        result = str(payload.get("result", "")).strip()
-        if result:
-            return f"[result] {result}"
-        return "[result] completed"
-
-    if event_type == "item.completed":
-        item = payload.get("item") or {}
-        if item.get("type") == "agent_message":
-            body = str(item.get("text", "")).strip()
-            return body
+    rendered = handler(payload)
+    return text if rendered is None else rendered
 
-    return text
 
+# Only short lines are memoised: heartbeat/status events repeat verbatim, while
+# multi-kilobyte tool results would just pin memory in the cache.
+_MEMO_LINE_LIMIT = 512
 
-def render_formatted_logs(lines: List[str]) -> str:
-    rendered: List[str] = []
-    for line in lines:
-        chunk = format_stream_json_line(line)
-        if chunk:
-            rendered.append(chunk)
-    return "\n".join(rendered)
+
+@lru_cache(maxsize=8192)
+def _format_short_stream_line(line: str) -> str:
+    return _format_stream_line(line)
+
+
+def format_stream_json_line(line: str) -> str:
+    if len(line) <= _MEMO_LINE_LIMIT:
+        return _format_short_stream_line(line)
+    return _format_stream_line(line)
+
+
+def format_history_option(value: str) -> str:
+    return "请选择历史会话" if value == "" else value
+
+
+_LOG_TAIL_CACHE_KEY = "_log_tail_cache"
+_LOG_TAIL_CACHE_SESSIONS = 8
+# Raw stream-json lines are often several KB each, so the raw view shows a shorter tail.
+_RAW_LOG_LINE_LIMIT = 300
+
+
+def _tail_log_window(
+    session_id: str,
+    log_path: Path,
+    stat: Optional[os.stat_result],
+    max_lines: int,
+    view: str,
+    transform: Optional[Callable[[str], str]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Keep the last ``max_lines`` log lines for ``view``, reading only bytes appended since the last rerun.
+
+    ``stat`` is the caller's stat of ``log_path`` (None if missing), so one rerun stats
+    the log once. Lines pass through ``transform`` once, when they are first read.
+    Returns the cache entry (``lines`` plus a ``rendered`` slot that is reset whenever
+    lines change), or None if the log does not exist.
+    """
+    cache: Dict[Tuple[str, str], Dict[str, Any]] = st.session_state.setdefault(_LOG_TAIL_CACHE_KEY, {})
+    key = (session_id, view)
+    if stat is None:
+        cache.pop(key, None)
+        return None
+
+    entry = cache.get(key)
+    if (
+        entry is None
+        or entry["max_lines"] != max_lines
+        or entry["inode"] != stat.st_ino
+        or stat.st_size < entry["offset"]
+    ):
+        # First view, resized window, or the log was replaced/truncated: rebuild.
+        entry = {
+            "inode": stat.st_ino,
+            "offset": 0,
+            "max_lines": max_lines,
+            "lines": deque(maxlen=max_lines),
+            "rendered": None,
+        }
+        cache.pop(key, None)
+        cache[key] = entry
+        while len(cache) > _LOG_TAIL_CACHE_SESSIONS:
+            cache.pop(next(iter(cache)))
+
+    if stat.st_size > entry["offset"]:
+        lines, entry["offset"] = read_log_lines_since(log_path, entry["offset"], max_lines=max_lines)
+        if lines:
+            entry["lines"].extend(map(transform, lines) if transform else lines)
+            entry["rendered"] = None
+
+    return entry
+
+
+def tail_session_log(
+    session_id: str, log_path: Path, log_stat: Optional[os.stat_result], max_lines: int
+) -> Deque[str]:
+    max_lines = min(max_lines, _RAW_LOG_LINE_LIMIT)
+    entry = _tail_log_window(session_id, log_path, log_stat, max_lines, "raw")
+    return entry["lines"] if entry is not None else deque()
+
+
+def render_formatted_logs(
+    session_id: str, log_path: Path, log_stat: Optional[os.stat_result], max_lines: int
+) -> Optional[str]:
+    """Render the last ``max_lines`` log lines; returns None when the window holds no lines."""
+    entry = _tail_log_window(
+        session_id, log_path, log_stat, max_lines, "formatted", format_stream_json_line
+    )
+    if entry is None or not entry["lines"]:
+        return None
+
+    # Refresh ticks with no new log lines reuse the previous render.
+    if entry["rendered"] is None:
+        # Blank chunks (e.g. empty lines) are dropped; join sizes the result in one pass.
+        entry["rendered"] = "\n".join(filter(None, entry["lines"]))
+    return entry["rendered"]
+
+
+# Keyed on mtime and size, so the output panel's periodic refresh re-reads a preview
+# only after the underlying file has changed.
+@st.cache_data(max_entries=32, show_spinner=False)
+def _cached_text_preview(path_str: str, mtime_ns: int, size: int) -> Tuple[str, bool]:
+    return read_text_preview(Path(path_str))
 
 
 def render_file_preview(title: str, path: Path, language: str) -> None:
-    with st.expander(title, expanded=path.exists()):
+    stat = _stat_or_none(path)
+    with st.expander(title, expanded=stat is not None):
         st.caption(to_display_path(path))
-        if not path.exists():
+        if stat is None:
             st.info("尚未生成。")
             return
 
-        preview, truncated = read_text_preview(path)
+        preview, truncated = _cached_text_preview(str(path), stat.st_mtime_ns, stat.st_size)
         st.download_button(
             label=f"下载 {path.name}",
-            data=path.read_bytes(),
+            data=path.read_bytes,
             file_name=path.name,
             mime="text/plain",
             width="stretch",
@@ -175,6 +321,112 @@ def render_file_preview(title: str, path: Path, language: str) -> None:
             st.caption(f"预览已截断至前 {PREVIEW_CHAR_LIMIT} 个字符。")
 
 
+# Archives are written to disk and read back only when the download is clicked, so a
+# large session never sits in the Python heap or the cache.
+_ARCHIVE_DIR = Path(tempfile.gettempdir()) / "patent_writer_archives"
+_ARCHIVE_TTL_SECONDS = 3600
+_ARCHIVE_MAX_FILES = 8
+
+
+def _prune_archive_dir(keep: str) -> None:
+    """Delete spooled archives past the TTL, then all but the newest few, sparing ``keep``."""
+    try:
+        entries = [
+            (entry.stat().st_mtime, entry.path)
+            for entry in os.scandir(_ARCHIVE_DIR)
+            if entry.is_file() and entry.name.endswith(".zip") and entry.name != keep
+        ]
+    except OSError:
+        return
+    entries.sort(reverse=True)
+    cutoff = time.time() - _ARCHIVE_TTL_SECONDS
+    for index, (mtime, path) in enumerate(entries):
+        # One slot is left for ``keep``, which is about to be (re)written.
+        if mtime < cutoff or index >= _ARCHIVE_MAX_FILES - 1:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+# Matches the on-disk sweep: a cached path outlives neither its TTL nor the newest-N window,
+# so the cache doesn't keep handing out archives the sweep is about to delete.
+@st.cache_data(ttl=_ARCHIVE_TTL_SECONDS, max_entries=_ARCHIVE_MAX_FILES, show_spinner=False)
+def _cached_session_archive(session_id: str, fingerprint: Tuple[int, int, int]) -> Optional[str]:
+    # ``fingerprint`` only keys the cache: any file change in the session invalidates it.
+    archive_path = _ARCHIVE_DIR / f"{session_id}.zip"
+    _prune_archive_dir(keep=archive_path.name)
+    if not save_session_archive(session_id, archive_path):
+        return None
+    return str(archive_path)
+
+
+def get_session_archive(session_id: str) -> Optional[Path]:
+    fingerprint = session_fingerprint(session_id)
+    archive_name = _cached_session_archive(session_id, fingerprint)
+    if archive_name is not None and not os.path.exists(archive_name):
+        # The temp directory was cleaned behind our back; rebuild once.
+        _cached_session_archive.clear(session_id, fingerprint)
+        archive_name = _cached_session_archive(session_id, fingerprint)
+    return Path(archive_name) if archive_name is not None else None
+
+
+_PROBE_CACHE_TTL_SECONDS = 30
+
+
+def _output_dir_mtime_ns() -> int:
+    # Creating or removing a log, pid file or temp_ directory bumps this, so new
+    # sessions show up without waiting for the cache TTL.
+    try:
+        return OUTPUT_DIR.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+@st.cache_data(ttl=_PROBE_CACHE_TTL_SECONDS, show_spinner=False)
+def _cached_sessions(output_dir_mtime_ns: int) -> List[str]:
+    return list_sessions()
+
+
+@st.cache_data(ttl=_PROBE_CACHE_TTL_SECONDS, show_spinner=False)
+def _cached_available_runtime_backends() -> List[str]:
+    return get_available_runtime_backends()
+
+
+@st.cache_data(ttl=_PROBE_CACHE_TTL_SECONDS, show_spinner=False)
+def _cached_available_cli_backends() -> List[str]:
+    return get_available_cli_backends()
+
+
+@st.cache_data(ttl=_PROBE_CACHE_TTL_SECONDS, show_spinner=False)
+def _cached_is_runtime_available(runtime_backend: str) -> bool:
+    return is_runtime_available(runtime_backend)
+
+
+@st.cache_data(ttl=_PROBE_CACHE_TTL_SECONDS, show_spinner=False)
+def _cached_is_cli_available(cli_backend: str) -> bool:
+    return is_cli_available(cli_backend)
+
+
+@st.cache_data(ttl=_PROBE_CACHE_TTL_SECONDS, show_spinner=False)
+def _cached_runtime_setup_hint(runtime_backend: str) -> str:
+    return runtime_setup_hint(runtime_backend)
+
+
+def clear_probe_caches() -> None:
+    """Drop cached session listings and backend probes after an action that may change them."""
+    for cached in (
+        _cached_sessions,
+        _cached_history_table,
+        _cached_available_runtime_backends,
+        _cached_available_cli_backends,
+        _cached_is_runtime_available,
+        _cached_is_cli_available,
+        _cached_runtime_setup_hint,
+    ):
+        cached.clear()
+
+
 def get_backend_display_for_metadata(metadata: Dict[str, Any]) -> str:
     mode = normalize_execution_mode(str(metadata.get("execution_mode", DEFAULT_EXECUTION_MODE)))
     if mode == EXEC_MODE_CLI:
@@ -185,10 +437,12 @@ def get_backend_display_for_metadata(metadata: Dict[str, Any]) -> str:
 
 
 def build_history_rows(session_ids: List[str]) -> List[Dict[str, Any]]:
+    log_stats = scan_log_stats()
+    running = list_running_metadata()
     rows: List[Dict[str, Any]] = []
     for session_id in session_ids:
-        log_path = get_log_path(session_id)
-        metadata = get_running_metadata(session_id)
+        log_stat = log_stats.get(session_id)
+        metadata = running.get(session_id)
         rows.append(
             {
                 "会话 ID": session_id,
@@ -196,18 +450,33 @@ def build_history_rows(session_ids: List[str]) -> List[Dict[str, Any]]:
                 "运行模式": get_execution_mode_label(str(metadata.get("execution_mode", DEFAULT_EXECUTION_MODE))) if metadata else "-",
                 "后端引擎": get_backend_display_for_metadata(metadata) if metadata else "-",
                 "进程 PID": str(metadata.get("pid", "-")) if metadata else "-",
-                "日志大小": human_file_size(log_path.stat().st_size) if log_path.exists() else "0 B",
-                "最后更新": format_timestamp(log_path.stat().st_mtime if log_path.exists() else None),
+                "日志大小": human_file_size(log_stat.st_size) if log_stat else "0 B",
+                "最后更新": format_timestamp(log_stat.st_mtime if log_stat else None),
             }
         )
     return rows
 
 
+# Rows carry live log sizes and pid status, so they are only reused briefly. The table is
+# built as Arrow so st.dataframe skips its pandas round trip.
+@st.cache_data(ttl=2, max_entries=4, show_spinner=False)
+def _cached_history_table(session_ids: Tuple[str, ...], output_dir_mtime_ns: int) -> pa.Table:
+    return pa.Table.from_pylist(build_history_rows(list(session_ids)))
+
+
 # ---------------------------------------------------------------------------
 # Core actions
 # ---------------------------------------------------------------------------
 
 
+@st.cache_resource(max_entries=64, show_spinner=False)
+def _session_lock(session_id: str) -> threading.Lock:
+    # Shared across reruns and browser tabs so start/stop for one session never interleave.
+    # Bounded so a long-running server doesn't keep a lock for every session it has seen;
+    # locks are only held briefly, so evicting the least recently used one is harmless.
+    return threading.Lock()
+
+
 def start_generation(
     session_id: str,
     input_path: Path,
@@ -254,41 +523,50 @@ def start_generation(
         )
         backend_msg = safe_runtime_label(runtime_backend)
 
-    append_log_banner(session_id, command)
-    try:
-        with get_log_path(session_id).open("ab") as log_handle:
-            process = subprocess.Popen(
-                command,
-                cwd=str(ROOT_DIR),
-                stdout=log_handle,
-                stderr=subprocess.STDOUT,
-                preexec_fn=os.setsid if os.name != "nt" else None,
-            )
-    except OSError as exc:
-        return False, f"启动进程失败: {exc}"
-
-    write_pid_metadata(
-        session_id=session_id,
-        pid=process.pid,
-        command=command,
-        input_path=input_path,
-        prompt=prompt,
-        execution_mode=execution_mode,
-        runtime_backend=runtime_backend,
-        cli_backend=cli_backend,
-    )
+    with _session_lock(session_id):
+        # Re-check under the lock: two quick reruns can both pass the check above.
+        if get_running_metadata(session_id):
+            return False, "该会话正在运行中。"
+
+        try:
+            with get_log_path(session_id).open("ab") as log_handle:
+                # Banner goes through the same handle; flush before the child inherits it.
+                log_handle.write(format_log_banner(session_id, command))
+                log_handle.flush()
+                process = subprocess.Popen(
+                    command,
+                    cwd=str(ROOT_DIR),
+                    stdout=log_handle,
+                    stderr=subprocess.STDOUT,
+                    start_new_session=True,
+                )
+        except OSError as exc:
+            return False, f"启动进程失败: {exc}"
+
+        register_spawned_process(process)
+        write_pid_metadata(
+            session_id=session_id,
+            pid=process.pid,
+            command=command,
+            input_path=input_path,
+            prompt=prompt,
+            execution_mode=execution_mode,
+            runtime_backend=runtime_backend,
+            cli_backend=cli_backend,
+        )
     return True, f"已使用 {backend_msg} 启动会话 {session_id} (PID {process.pid})。"
 
 
 def stop_generation(session_id: str) -> tuple[bool, str]:
-    metadata = get_running_metadata(session_id)
-    if not metadata:
+    with _session_lock(session_id):
+        metadata = get_running_metadata(session_id)
         remove_pid_metadata(session_id)
+    if not metadata:
         return False, "找不到该会话的运行进程。"
 
+    # Terminating can take seconds; doing it outside the lock keeps start/status responsive.
     pid = int(metadata["pid"])
     success, message = terminate_pid_tree(pid)
-    remove_pid_metadata(session_id)
     append_log_footer(session_id, f"会话已被手动停止 (pid={pid})")
     return success, f"{message} pid={pid}"
 
@@ -298,23 +576,113 @@ def stop_generation(session_id: str) -> tuple[bool, str]:
 # ---------------------------------------------------------------------------
 
 
+def _stat_or_none(path: Path) -> Optional[os.stat_result]:
+    try:
+        return path.stat()
+    except OSError:
+        return None
+
+
+def render_status_metrics(session_id: str, log_path: Optional[Path], was_running: bool) -> None:
+    running_metadata = get_running_metadata(session_id) if is_valid_uuid(session_id) else None
+    if (running_metadata is not None) != was_running:
+        # The run started or finished since the last full rerun; refresh the controls too.
+        st.rerun()
+
+    log_stat = _stat_or_none(log_path) if log_path is not None else None
+    status_col, pid_col, log_col, update_col = st.columns(4)
+    status_col.metric("状态", "运行中" if running_metadata else "系统空闲")
+    pid_col.metric("进程 PID", str(running_metadata.get("pid")) if running_metadata else "-")
+    log_col.metric("日志大小", human_file_size(log_stat.st_size) if log_stat else "0 B")
+    update_col.metric("日志最后更新", format_timestamp(log_stat.st_mtime if log_stat else None))
+
+
+def render_log_panel(session_id: str, log_path: Path) -> None:
+    log_stat = _stat_or_none(log_path)
+    if st.session_state.show_raw_json:
+        lines = tail_session_log(session_id, log_path, log_stat, st.session_state.max_log_lines)
+        if not lines:
+            st.info("暂无日志记录可以显示。")
+        else:
+            st.code("".join(lines), language="json")
+            if st.session_state.max_log_lines > _RAW_LOG_LINE_LIMIT:
+                st.caption(f"原始 JSON 视图最多显示最近 {_RAW_LOG_LINE_LIMIT} 行。")
+    else:
+        rendered = render_formatted_logs(
+            session_id,
+            log_path,
+            log_stat,
+            st.session_state.max_log_lines,
+        )
+        if rendered is None:
+            st.info("暂无日志记录可以显示。")
+        else:
+            st.code(rendered or "目前加载的日志窗口内没有解析出有效消息。", language="text")
+
+    if log_stat is not None:
+        st.download_button(
+            label=f"Download {log_path.name}",
+            data=log_path.read_bytes,
+            file_name=log_path.name,
+            mime="text/plain",
+            width="stretch",
+        )
+
+
+# Output previews re-read up to five files, so they refresh less often than the log.
+_OUTPUT_REFRESH_SECONDS = 10
+
+
+# (path relative to the session dir, code language) for each output preview.
+_PREVIEW_FILES: Tuple[Tuple[str, str], ...] = (
+    ("01_input/parsed_info.json", "json"),
+    ("04_content/abstract.md", "markdown"),
+    ("04_content/claims.md", "markdown"),
+    ("04_content/description.md", "markdown"),
+    ("06_final/complete_patent.md", "markdown"),
+)
+
+
+def render_output_panel(session_id: str, running: bool) -> None:
+    session_dir = get_session_dir(session_id)
+    st.caption(to_display_path(session_dir))
+    archive_path: Optional[Path] = None
+    if not running:
+        archive_requested = st.session_state.get("archive_session_id") == session_id
+        if not archive_requested and st.button("打包此会话的全部文件", width="stretch"):
+            st.session_state.archive_session_id = session_id
+            archive_requested = True
+        if archive_requested:
+            archive_path = get_session_archive(session_id)
+    if archive_path is not None:
+        st.download_button(
+            label=f"将此会话一键打包下载 ({session_id}.zip)",
+            data=archive_path.read_bytes,
+            file_name=f"patent_session_{session_id}.zip",
+            mime="application/zip",
+            width="stretch",
+        )
+    else:
+        st.caption("当一次完整的生成任务结束后，您可以一键打包下载全部中间及最终文件。")
+    for relative_path, language in _PREVIEW_FILES:
+        render_file_preview(relative_path, session_dir / relative_path, language)
+
+
 def ensure_directories() -> None:
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     (DATA_DIR / "uploads").mkdir(parents=True, exist_ok=True)
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def safe_rerun() -> None:
-    rerun = getattr(st, "rerun", None)
-    if callable(rerun):
-        rerun()
-    else:
-        st.experimental_rerun()
+@st.cache_resource(show_spinner=False)
+def prepare_workspace() -> None:
+    # Once per server process; stale pid files are also dropped by the cleanup button
+    # and whenever get_running_metadata() finds a dead pid.
+    ensure_directories()
+    cleanup_stale_pid_files()
 
 
-def inject_styles() -> None:
-    st.markdown(
-        """
+_CSS_BLOCK = """
 <style>
 @import url('https://fonts.googleapis.com/css2?family=Space+Grotesk:wght@400;500;700&family=IBM+Plex+Mono:wght@400;500&display=swap');
 .stApp {
@@ -335,36 +703,49 @@ section[data-testid="stSidebar"] { background: linear-gradient(180deg, #ffffff 0
   .main .block-container { padding-top: 1rem; padding-left: 0.85rem; padding-right: 0.85rem; }
 }
 </style>
-""",
-        unsafe_allow_html=True,
-    )
+"""
+
+
+def inject_styles() -> None:
+    # Streamlit drops elements that a full rerun does not re-emit, so the styles are sent
+    # on every full rerun; fragment reruns leave them in place.
+    st.markdown(_CSS_BLOCK, unsafe_allow_html=True)
+
+
+def _default_runtime_backend() -> str:
+    if DEFAULT_RUNTIME_BACKEND in RUNTIME_CONFIGS:
+        return DEFAULT_RUNTIME_BACKEND
+    return list(RUNTIME_CONFIGS.keys())[0]
+
+
+_STATE_DEFAULTS: Dict[str, Any] = {
+    "history_selection": "",
+    "selected_execution_mode": DEFAULT_EXECUTION_MODE,
+    "selected_runtime_backend": _default_runtime_backend(),
+    "selected_cli_backend": DEFAULT_CLI_BACKEND,
+    "input_mode": MODE_NORMAL,
+    "fast_invention_idea": "",
+    "fast_regenerate": False,
+    "custom_prompt": "",
+    "show_raw_json": False,
+    "max_log_lines": 500,
+    "auto_refresh": True,
+    "refresh_seconds": 2,
+    "description_parallelism": DEFAULT_DESCRIPTION_PARALLELISM,
+}
+
+# Defaults that must be resolved per browser session rather than at import.
+_LAZY_STATE_DEFAULTS: Dict[str, Callable[[], Any]] = {
+    "session_id": lambda: str(uuid.uuid4()),
+    "input_path": lambda: to_display_path(get_default_input_path()),
+}
 
 
 def initialize_state() -> None:
-    default_runtime_backend = DEFAULT_RUNTIME_BACKEND
-    if default_runtime_backend not in RUNTIME_CONFIGS:
-        default_runtime_backend = list(RUNTIME_CONFIGS.keys())[0]
-
-    defaults: Dict[str, Any] = {
-        "session_id": str(uuid.uuid4()),
-        "history_selection": "",
-        "selected_execution_mode": DEFAULT_EXECUTION_MODE,
-        "selected_runtime_backend": default_runtime_backend,
-        "selected_cli_backend": DEFAULT_CLI_BACKEND,
-        "input_mode": MODE_NORMAL,
-        "input_path": to_display_path(get_default_input_path()),
-        "fast_invention_idea": "",
-        "custom_prompt": "",
-        "show_raw_json": False,
-        "max_log_lines": 500,
-        "auto_refresh": True,
-        "refresh_seconds": 2,
-        "description_parallelism": DEFAULT_DESCRIPTION_PARALLELISM,
-    }
-
-    for key, value in defaults.items():
-        if key not in st.session_state:
-            st.session_state[key] = value
+    missing = (_STATE_DEFAULTS.keys() | _LAZY_STATE_DEFAULTS.keys()) - st.session_state.keys()
+    for key in missing:
+        factory = _LAZY_STATE_DEFAULTS.get(key)
+        st.session_state[key] = factory() if factory else _STATE_DEFAULTS[key]
 
 
 def normalize_state_values() -> None:
@@ -408,8 +789,7 @@ def normalize_state_values() -> None:
 def main() -> None:
     st.set_page_config(page_title="专利撰写助手", page_icon=":memo:", layout="wide")
     inject_styles()
-    ensure_directories()
-    cleanup_stale_pid_files()
+    prepare_workspace()
     initialize_state()
     normalize_state_values()
 
@@ -424,7 +804,8 @@ def main() -> None:
         unsafe_allow_html=True,
     )
 
-    sessions = list_sessions()
+    output_dir_mtime_ns = _output_dir_mtime_ns()
+    sessions = _cached_sessions(output_dir_mtime_ns)
 
     with st.sidebar:
         st.markdown("### 会话管理")
@@ -436,13 +817,13 @@ def main() -> None:
             "历史会话",
             options=[""] + sessions,
             key="history_selection",
-            format_func=lambda value: "请选择历史会话" if value == "" else value,
+            format_func=format_history_option,
         )
         if st.button("加载所选会话", width="stretch"):
             selected = st.session_state.history_selection
             if selected:
                 st.session_state.session_id = selected
-                safe_rerun()
+                st.rerun()
 
         st.markdown("---")
         st.markdown("### 运行环境配置")
@@ -502,6 +883,11 @@ def main() -> None:
                     "简要描述您的发明构思。极速模式会自动将其扩充为结构化的交底书文档。"
                 ),
             )
+            st.checkbox(
+                "重新扩充交底书（忽略已缓存的结果）",
+                key="fast_regenerate",
+                help="相同的构思和后端默认复用上一次的扩充结果；勾选后会重新调用模型生成。",
+            )
             st.caption(
                 "极速模式会先将您的构思扩充为交底书 .docx 文件，然后再作为输入运行标准专利生成流程。"
             )
@@ -536,17 +922,19 @@ def main() -> None:
         to_positive_int(st.session_state.description_parallelism, DEFAULT_DESCRIPTION_PARALLELISM)
     )
 
-    fast_idea = str(st.session_state.fast_invention_idea or "").strip()
+    fast_idea = st.session_state.fast_invention_idea.strip()
 
     input_path = resolve_workspace_path(st.session_state.input_path)
-    log_path = get_log_path(session_id) if is_valid_uuid(session_id) else None
-    running_metadata = get_running_metadata(session_id) if is_valid_uuid(session_id) else None
+    input_exists = input_path.exists()
+    session_valid = is_valid_uuid(session_id)
+    log_path = get_log_path(session_id) if session_valid else None
+    running_metadata = get_running_metadata(session_id) if session_valid else None
 
-    available_runtime_backends = get_available_runtime_backends()
-    available_cli_backends = get_available_cli_backends()
+    available_runtime_backends = _cached_available_runtime_backends()
+    available_cli_backends = _cached_available_cli_backends()
 
-    selected_runtime_ready = is_runtime_available(selected_runtime_backend)
-    selected_cli_ready = is_cli_available(selected_cli_backend)
+    selected_runtime_ready = _cached_is_runtime_available(selected_runtime_backend)
+    selected_cli_ready = _cached_is_cli_available(selected_cli_backend)
 
     selected_mode_label = get_execution_mode_label(selected_execution_mode)
     if selected_execution_mode == EXEC_MODE_CLI:
@@ -566,13 +954,12 @@ def main() -> None:
 
     st.caption(f"当前活动会话: `{session_id}`" if session_id else "当前活动会话: `-`")
 
-    status_col, pid_col, log_col, update_col = st.columns(4)
-    status_col.metric("状态", "运行中" if running_metadata else "系统空闲")
-    pid_col.metric("进程 PID", str(running_metadata.get("pid")) if running_metadata else "-")
-    log_size = human_file_size(log_path.stat().st_size) if log_path and log_path.exists() else "0 B"
-    log_col.metric("日志大小", log_size)
-    update_time = format_timestamp(log_path.stat().st_mtime if log_path and log_path.exists() else None)
-    update_col.metric("日志最后更新", update_time)
+    live_refresh_seconds: Optional[int] = None
+    if st.session_state.auto_refresh and running_metadata is not None:
+        live_refresh_seconds = st.session_state.refresh_seconds
+    st.fragment(run_every=live_refresh_seconds)(render_status_metrics)(
+        session_id, log_path, running_metadata is not None
+    )
 
     st.caption(
         f"当前已选配置: `{selected_mode_label}` / `{selected_backend_label}` | "
@@ -580,7 +967,7 @@ def main() -> None:
         f" | 说明书正文并发数: `{description_parallelism}`"
     )
 
-    if not is_valid_uuid(session_id):
+    if not session_valid:
         st.warning("Session ID 必须是有效的 UUID。")
 
     if selected_execution_mode == EXEC_MODE_NATIVE:
@@ -590,7 +977,7 @@ def main() -> None:
             )
         elif not selected_runtime_ready:
             st.warning(
-                f"{selected_backend_label} 未就绪。{runtime_setup_hint(selected_runtime_backend)}"
+                f"{selected_backend_label} 未就绪。{_cached_runtime_setup_hint(selected_runtime_backend)}"
             )
     else:
         if not available_cli_backends:
@@ -600,7 +987,7 @@ def main() -> None:
         elif not selected_cli_ready:
             st.warning(f"在系统 PATH 中未找到 {selected_backend_label}。")
 
-    if input_mode == MODE_NORMAL and not input_path.exists():
+    if input_mode == MODE_NORMAL and not input_exists:
         st.warning(f"输入文件不存在: {input_path}")
     if input_mode == MODE_FAST and not fast_idea:
         st.warning("极速模式需要填写简要的发明构思。")
@@ -608,9 +995,9 @@ def main() -> None:
     start_col, stop_col, cleanup_col, refresh_col = st.columns(4)
     start_disabled = (
         running_metadata is not None
-        or not is_valid_uuid(session_id)
+        or not session_valid
         or not selected_ready
-        or (input_mode == MODE_NORMAL and not input_path.exists())
+        or (input_mode == MODE_NORMAL and not input_exists)
         or (input_mode == MODE_FAST and not fast_idea)
     )
 
@@ -639,6 +1026,9 @@ def main() -> None:
     )
     refresh_clicked = refresh_col.button("手动刷新状态", width="stretch")
 
+    if start_clicked or stop_clicked or cleanup_clicked or refresh_clicked:
+        clear_probe_caches()
+
     if start_clicked:
         effective_input_path = input_path
 
@@ -650,15 +1040,16 @@ def main() -> None:
                     runtime_backend=selected_runtime_backend,
                     cli_backend=selected_cli_backend,
                     invention_idea=fast_idea,
+                    regenerate=st.session_state.fast_regenerate,
                 )
             if not fast_ok:
                 st.error(fast_message)
-                safe_rerun()
+                st.rerun()
                 return
 
             if generated_path is None:
                 st.error("极速模式执行后未能获得生成的输入文本。")
-                safe_rerun()
+                st.rerun()
                 return
 
             effective_input_path = generated_path
@@ -676,7 +1067,7 @@ def main() -> None:
         )
         if success:
             st.success(message)
-            safe_rerun()
+            st.rerun()
         else:
             st.error(message)
 
@@ -686,7 +1077,7 @@ def main() -> None:
             st.success(message)
         else:
             st.warning(message)
-        safe_rerun()
+        st.rerun()
 
     if cleanup_clicked:
         if cleanup_mode == EXEC_MODE_CLI:
@@ -703,94 +1094,38 @@ def main() -> None:
                 st.success(f"清理完成，强行终止了 {killed} 个原生引擎流水机进程。")
             else:
                 st.info("没有找到仍在运行中的流水线进程。")
-        safe_rerun()
+        st.rerun()
 
     if refresh_clicked:
-        safe_rerun()
+        st.rerun()
 
     log_tab, output_tab, history_tab = st.tabs(["实时运行日志", "生成的文件结果", "运行历史记录"])
 
     with log_tab:
-        if not is_valid_uuid(session_id):
+        if not session_valid:
             st.info("请提供一个有效的会话 ID 来查看日志流水。")
         else:
-            lines = tail_log_lines(get_log_path(session_id), st.session_state.max_log_lines)
-            if not lines:
-                st.info("暂无日志记录可以显示。")
-            else:
-                if st.session_state.show_raw_json:
-                    st.code("".join(lines), language="json")
-                else:
-                    rendered = render_formatted_logs(lines)
-                    st.code(rendered or "目前加载的日志窗口内没有解析出有效消息。", language="text")
-
-            current_log_path = get_log_path(session_id)
-            if current_log_path.exists():
-                st.download_button(
-                    label=f"Download {current_log_path.name}",
-                    data=current_log_path.read_bytes(),
-                    file_name=current_log_path.name,
-                    mime="text/plain",
-                    width="stretch",
-                )
+            st.fragment(run_every=live_refresh_seconds)(render_log_panel)(session_id, log_path)
 
     with output_tab:
-        if not is_valid_uuid(session_id):
+        if not session_valid:
             st.info("请提供一个有效的会话 ID 来查看所生成的文件。")
         else:
-            session_dir = get_session_dir(session_id)
-            st.caption(to_display_path(session_dir))
-            archive_data: Optional[bytes] = None
-            if running_metadata is None:
-                archive_data = build_session_archive(session_id)
-            if archive_data is not None:
-                st.download_button(
-                    label=f"将此会话一键打包下载 ({session_id}.zip)",
-                    data=archive_data,
-                    file_name=f"patent_session_{session_id}.zip",
-                    mime="application/zip",
-                    width="stretch",
-                )
-            else:
-                st.caption("当一次完整的生成任务结束后，您可以一键打包下载全部中间及最终文件。")
-            render_file_preview(
-                "01_input/parsed_info.json",
-                session_dir / "01_input" / "parsed_info.json",
-                "json",
-            )
-            render_file_preview(
-                "04_content/abstract.md",
-                session_dir / "04_content" / "abstract.md",
-                "markdown",
-            )
-            render_file_preview(
-                "04_content/claims.md",
-                session_dir / "04_content" / "claims.md",
-                "markdown",
-            )
-            render_file_preview(
-                "04_content/description.md",
-                session_dir / "04_content" / "description.md",
-                "markdown",
-            )
-            render_file_preview(
-                "06_final/complete_patent.md",
-                session_dir / "06_final" / "complete_patent.md",
-                "markdown",
+            output_refresh_seconds = None
+            if live_refresh_seconds is not None:
+                output_refresh_seconds = max(live_refresh_seconds, _OUTPUT_REFRESH_SECONDS)
+            st.fragment(run_every=output_refresh_seconds)(render_output_panel)(
+                session_id, running_metadata is not None
             )
 
     with history_tab:
-        session_rows = build_history_rows(sessions)
-        if not session_rows:
+        history_table = _cached_history_table(tuple(sessions), output_dir_mtime_ns)
+        if history_table.num_rows == 0:
             st.info("尚未发现历史会话记录。")
         else:
-            st.dataframe(session_rows, width="stretch", hide_index=True)
+            st.dataframe(history_table, width="stretch", hide_index=True)
             st.caption("可从左侧配置栏下拉加载某个历史会话进程，以查看记录或尝试恢复生成操作。")
 
-    if st.session_state.auto_refresh and running_metadata is not None:
-        time.sleep(int(st.session_state.refresh_seconds))
-        safe_rerun()
-
 
 if __name__ == "__main__":
     main()